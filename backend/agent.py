@@ -1,15 +1,18 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
 import os
-from typing import TypedDict, Optional, Literal
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, TypedDict, Optional, Literal
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel, Field
 from langgraph.graph import END
 from langgraph.graph.state import StateGraph
+from langgraph.types import StreamWriter
 
 from backend.models import (
     ActionType,
@@ -24,8 +27,10 @@ from backend.context_manager import (
     build_context_messages,
     extract_preferences,
     maybe_compress,
-    _format_plan_for_context,
+    _format_plan_cached,
+    _format_preferences_cached,
 )
+from backend.agent_cache import ExactCache, SemanticCache, exact_key, prompt_key
 
 
 
@@ -34,10 +39,13 @@ class AgentState(TypedDict):
     user_input: str
     agent_response: Optional[AgentResponse]
     error: Optional[str]
+    compression: Optional[asyncio.Task]
 
 
 
-def _get_llm() -> ChatGoogleGenerativeAI:
+@lru_cache(maxsize=1)
+def get_llm() -> ChatGoogleGenerativeAI:
+    """Return the shared Gemini client (built once, reused across turns)."""
     return ChatGoogleGenerativeAI(
         model="gemini-2.5-pro",
         google_api_key=os.getenv("GOOGLE_API_KEY"),
@@ -45,6 +53,34 @@ def _get_llm() -> ChatGoogleGenerativeAI:
     )
 
 
+@lru_cache(maxsize=1)
+def get_structured_llm():
+    """Return the shared ``AgentResponse`` runnable, streaming partial dicts.
+
+    Binding the JSON schema (rather than the Pydantic class) makes
+    langchain parse with ``JsonOutputParser``, which yields the growing
+    object as tokens arrive; the Pydantic parser yields nothing until every
+    required field validates.  Callers validate the final dict themselves.
+    """
+    return get_llm().with_structured_output(AgentResponse.model_json_schema())
+
+
+@lru_cache(maxsize=1)
+def get_lite_llm() -> ChatGoogleGenerativeAI:
+    """Cheaper model for small auxiliary calls (e.g. rewriting cached replies)."""
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash-lite",
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        temperature=0.7,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_lite_structured_llm():
+    """Cheaper model used for casual turns that never touch the plan."""
+    return get_lite_llm().with_structured_output(AgentResponse)
+
+
 
 GUARDRAIL_PROMPT = """\
 You are a security and relevance guardrail for "Plan-It", a planning assistant.
@@ -95,24 +131,89 @@ Your job is to help users create, refine, and manage structured plans through na
 """
 
 
+REWRITE_PROMPT = """\
+You are Plan-It, a planning assistant. A previous reply was written for a user \
+message that is very similar to the new one below. Rewrite the reply so it \
+responds naturally to the new message. Keep the same meaning, decisions and \
+plan details. Return only the rewritten reply text.
+"""
+
+PENDING_PLAN_NOTE = (
+    "The user has NOT yet confirmed this plan. If they approve it, use action=CREATE. "
+    "If they want changes, PROPOSE a revised version."
+)
+
+# ── Fast-path classifiers ───
+# Both must match the *whole* (normalised) input, so "yes, but change step 2"
+# or "thanks, now add a deadline" still go through the full model.
+
+_AFFIRMATIVE = (
+    r"yes|yep|yeah|sure|ok|okay|great|perfect|approved?|confirm(?:ed)?|lgtm|"
+    r"looks good|sounds good|that works|go ahead|do it|"
+    r"finali[sz]e(?: (?:it|this plan|the plan))?"
+)
+# At least one real affirmative; "please" / "and" only as glue around them.
+_CONFIRM_RE = re.compile(
+    rf"(?:please )?(?:{_AFFIRMATIVE})(?: (?:{_AFFIRMATIVE}|and|please))*"
+)
+# Greetings, thanks and goodbyes only — "ok" / "great" / "cool" usually
+# answer the assistant's last question and need the full model.
+_SMALL_TALK = (
+    r"hi|hello|hey|thanks|thank you|thx|cheers|"
+    r"good (?:morning|afternoon|evening)|bye|goodbye"
+)
+_CHITCHAT_RE = re.compile(
+    rf"(?:{_SMALL_TALK})(?: (?:{_SMALL_TALK}|there|so much|a lot|again))*"
+)
+
+CONFIRMED_REPLY = "Great — your plan is finalized! Let me know whenever you'd like to update it or track progress."
+
+
+def _normalize_turn(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+# Prompts are constant — build their messages once rather than every turn.
+_SYSTEM_MSG = SystemMessage(content=SYSTEM_PROMPT)
+_GUARDRAIL_MSG = SystemMessage(content=GUARDRAIL_PROMPT)
+
+
+# ── Response caches ───
+
+_exact_cache = ExactCache()
+_semantic_cache = SemanticCache()
+
+
+async def _rewrite_reply(llm: ChatGoogleGenerativeAI, cached: AgentResponse, user_input: str) -> str:
+    """Adapt a semantically-cached reply to the user's actual wording."""
+    result = await llm.ainvoke([
+        SystemMessage(content=REWRITE_PROMPT),
+        HumanMessage(content=f"[New user message]\n{user_input}\n\n[Previous reply]\n{cached.response_to_user}"),
+    ])
+    return result.content
+
 
 class GuardrailDecision(BaseModel):
     is_safe: bool = Field(description="Whether the user input is allowed/relevant.")
     refusal_message: Optional[str] = Field(description="Message to user if unsafe.")
 
 
+@lru_cache(maxsize=1)
+def _get_guardrail_llm():
+    return get_llm().with_structured_output(GuardrailDecision)
+
+
 async def guardrails_node(state: AgentState) -> AgentState:
     """Check if the user input is relevant/safe."""
     user_input = state["user_input"]
-    llm = _get_llm()
 
     messages = [
-        SystemMessage(content=GUARDRAIL_PROMPT),
+        _GUARDRAIL_MSG,
         HumanMessage(content=user_input),
     ]
 
     try:
-        structured_llm = llm.with_structured_output(GuardrailDecision)
+        structured_llm = _get_guardrail_llm()
         decision: GuardrailDecision = await structured_llm.ainvoke(messages)
 
         if not decision.is_safe:
@@ -141,64 +242,153 @@ async def preprocess_node(state: AgentState) -> AgentState:
     user_input = state["user_input"]
 
     # Record the user message
-    session.messages.append(Message(role=MessageRole.USER, content=user_input))
+    session.add_message(Message(role=MessageRole.USER, content=user_input))
     session.turn_count += 1
 
     # Extract preferences
     session.user_preferences = extract_preferences(user_input, session.user_preferences)
 
-    # Compress if approaching token limit
-    llm = _get_llm()
-    session = await maybe_compress(session, llm)
+    # Compress if approaching token limit.  Runs in the background so the
+    # guardrail check and prompt assembly overlap with the summarisation call.
+    compression = asyncio.create_task(maybe_compress(session, get_llm()))
 
-    return {**state, "session": session}
+    return {**state, "session": session, "compression": compression}
 
 
-async def generate_node(state: AgentState) -> AgentState:
-    """Call Gemini to generate the structured agent response."""
-    session = state["session"]
-    llm = _get_llm()
+async def _await_compression(state: AgentState) -> Session:
+    """Return the session once any in-flight history compression has finished."""
+    compression = state.get("compression")
+    if compression is None:
+        return state["session"]
+    return await compression
+
 
-    # Build messages for the LLM
-    context = build_context_messages(session)
+def _partial_reply(chunk: Any) -> Optional[str]:
+    """Pull ``response_to_user`` out of a partial streamed dict."""
+    reply = chunk.get("response_to_user") if isinstance(chunk, dict) else None
+    return reply if isinstance(reply, str) else None
 
-    lc_messages = [SystemMessage(content=SYSTEM_PROMPT)]
+
+async def generate_node(state: AgentState, writer: StreamWriter) -> AgentState:
+    """Call Gemini to generate the structured agent response.
+
+    ``response_to_user`` is streamed to the graph's custom stream as it
+    arrives; the full ``AgentResponse`` is validated once the stream ends.
+    """
+    session = state["session"]
+
+    # Build messages for the LLM.  Gemini lifts every SystemMessage into
+    # system_instruction wherever it sits, so the per-turn plan / preference
+    # state rides on the latest user turn instead.  That keeps
+    # system_instruction + prior history a stable prefix turn over turn for
+    # the provider's implicit prompt cache.
+    state_blocks: list[str] = []
 
     # Inject current plan context
-    plan_ctx = _format_plan_for_context(session.current_plan)
     if session.current_plan:
-        lc_messages.append(SystemMessage(content=f"[Current confirmed plan]\n{plan_ctx}"))
+        plan_ctx = _format_plan_cached(session.current_plan.model_dump_json())
+        state_blocks.append(f"[Current confirmed plan]\n{plan_ctx}")
 
     # Inject pending (proposed) plan if awaiting confirmation
     if session.pending_plan:
-        pending_ctx = _format_plan_for_context(session.pending_plan)
-        lc_messages.append(SystemMessage(
-            content=f"[Pending proposed plan — awaiting user confirmation]\n{pending_ctx}\n"
-                    f"The user has NOT yet confirmed this plan. If they approve it, use action=CREATE. "
-                    f"If they want changes, PROPOSE a revised version."
-        ))
+        pending_ctx = _format_plan_cached(session.pending_plan.model_dump_json())
+        state_blocks.append(
+            f"[Pending proposed plan — awaiting user confirmation]\n{pending_ctx}\n{PENDING_PLAN_NOTE}"
+        )
 
     # Inject user preferences
     if session.user_preferences:
-        prefs = json.dumps(session.user_preferences)
-        lc_messages.append(SystemMessage(content=f"[Detected user preferences]: {prefs}"))
+        prefs = _format_preferences_cached(frozenset(session.user_preferences.items()))
+        state_blocks.append(f"[Detected user preferences]: {prefs}")
+
+    state_ctx = "\n\n".join(state_blocks)
 
-    # Add conversation history
-    for msg in context:
+    # Add conversation history (needs the compressed context, if any)
+    session = await _await_compression(state)
+    state = {**state, "session": session, "compression": None}
+    history = []
+    for msg in build_context_messages(session):
         role = msg["role"]
         content = msg["content"]
         if role == "user":
-            lc_messages.append(HumanMessage(content=content))
+            history.append(HumanMessage(content=content))
         elif role == "assistant":
-            lc_messages.append(AIMessage(content=content))
+            history.append(AIMessage(content=content))
         elif role == "system":
-            lc_messages.append(SystemMessage(content=content))
+            history.append(SystemMessage(content=content))
+
+    latest = history[-1:]
+    if state_ctx and latest and isinstance(latest[0], HumanMessage):
+        latest = [HumanMessage(content=f"{state_ctx}\n\n[Latest user message]\n{latest[0].content}")]
+    elif state_ctx:
+        latest = [*latest, HumanMessage(content=state_ctx)]
+    lc_messages = [_SYSTEM_MSG, *history[:-1], *latest]
+
+    user_input = state["user_input"]
+    normalized = _normalize_turn(user_input)
+
+    # Fast path: plain approval of a pending plan needs no LLM call at all.
+    if session.pending_plan and _CONFIRM_RE.fullmatch(normalized):
+        confirmed = AgentResponse(
+            thought="User approved the pending plan (rule-based fast path).",
+            response_to_user=CONFIRMED_REPLY,
+            action=ActionType.CREATE,
+            plan=session.pending_plan,
+            change_summary="Plan confirmed and created.",
+            plan_summary=session.plan_summary,
+            conversation_summary=session.conversation_summary,
+        )
+        return {**state, "agent_response": confirmed, "error": None}
+
+    # Response cache — keyed on everything except the latest user text.
+    prefix_key = prompt_key([_SYSTEM_MSG, *history[:-1], SystemMessage(content=state_ctx)])
+    cache_key = exact_key(prefix_key, user_input)
+
+    cached = _exact_cache.get(cache_key)
+    if cached is not None:
+        return {**state, "agent_response": cached, "error": None}
 
     try:
-        # Use structured output so Gemini returns a validated Pydantic object directly.
+        # Fast path: greetings / thanks go to the lite model with minimal context.
+        if not session.pending_plan and _CHITCHAT_RE.fullmatch(normalized):
+            casual: AgentResponse = await get_lite_structured_llm().ainvoke([_SYSTEM_MSG, *history[-3:]])
+            casual = casual.model_copy(update={
+                "action": ActionType.NONE,
+                "plan": None,
+                "change_summary": None,
+                "plan_summary": None,
+                # The lite call only saw the last few turns — keep the real summary.
+                "conversation_summary": session.conversation_summary,
+            })
+            _exact_cache.put(cache_key, casual)
+            return {**state, "agent_response": casual, "error": None}
+
+        # Near matches reuse a stored plan, so they stay within one user —
+        # on a first turn the prefix alone is shared by everyone.
+        semantic_key = f"{session.user_id}\x1d{prefix_key}"
+        embedding = await _semantic_cache.embed(user_input)
+        cached = _semantic_cache.get(semantic_key, embedding)
+        if cached is not None:
+            cached = cached.model_copy(
+                update={"response_to_user": await _rewrite_reply(get_lite_llm(), cached, user_input)}
+            )
+            _exact_cache.put(cache_key, cached)
+            return {**state, "agent_response": cached, "error": None}
+
+        # Structured output streams partial dicts; validate once at the end.
         #todo: tool calling for more complex actions   
-        structured_llm = llm.with_structured_output(AgentResponse)
-        agent_resp: AgentResponse = await structured_llm.ainvoke(lc_messages)
+        structured_llm = get_structured_llm()
+        final_chunk = None
+        streamed = ""
+        async for chunk in structured_llm.astream(lc_messages):
+            final_chunk = chunk
+            reply = _partial_reply(chunk)
+            if reply and len(reply) > len(streamed) and reply.startswith(streamed):
+                writer({"delta": reply[len(streamed):]})
+                streamed = reply
+        agent_resp = AgentResponse.model_validate(final_chunk)
+        _exact_cache.put(cache_key, agent_resp)
+        _semantic_cache.put(semantic_key, embedding, agent_resp)
         return {**state, "agent_response": agent_resp, "error": None}
 
     except Exception as e:
@@ -207,18 +397,18 @@ async def generate_node(state: AgentState) -> AgentState:
 
 async def postprocess_node(state: AgentState) -> AgentState:
     """Update the session with the agent's response — save plan versions, record assistant message."""
-    session = state["session"]
+    session = await _await_compression(state)
     agent_resp = state.get("agent_response")
     error = state.get("error")
 
     if error or agent_resp is None:
         # Record a fallback assistant message
         fallback = "I'm sorry, I ran into an issue processing your request. Could you try rephrasing?"
-        session.messages.append(Message(role=MessageRole.ASSISTANT, content=fallback))
-        return {**state, "session": session}
+        session.add_message(Message(role=MessageRole.ASSISTANT, content=fallback))
+        return {**state, "session": session, "compression": None}
 
     # Record the assistant reply
-    session.messages.append(
+    session.add_message(
         Message(role=MessageRole.ASSISTANT, content=agent_resp.response_to_user)
     )
 
@@ -231,7 +421,7 @@ async def postprocess_node(state: AgentState) -> AgentState:
         # User confirmed — promote to current plan
         session.current_plan = agent_resp.plan
         session.pending_plan = None  # clear pending
-        version_num = len(session.plan_versions) + 1
+        version_num = session.take_plan_version()
         session.plan_versions.append(
             PlanVersion(
                 version=version_num,
@@ -242,7 +432,7 @@ async def postprocess_node(state: AgentState) -> AgentState:
 
     elif agent_resp.action == ActionType.UPDATE and agent_resp.plan:
         session.current_plan = agent_resp.plan
-        version_num = len(session.plan_versions) + 1
+        version_num = session.take_plan_version()
         session.plan_versions.append(
             PlanVersion(
                 version=version_num,
@@ -261,7 +451,7 @@ async def postprocess_node(state: AgentState) -> AgentState:
     if agent_resp.change_summary:
         session.change_summary = agent_resp.change_summary
 
-    return {**state, "session": session}
+    return {**state, "session": session, "compression": None}
 
 
 def route_guardrails(state: AgentState) -> Literal["generate", "postprocess"]:
@@ -304,6 +494,16 @@ def _get_graph():
     return _compiled_graph
 
 
+def _initial_state(session: Session, user_input: str) -> AgentState:
+    return {
+        "session": session,
+        "user_input": user_input,
+        "agent_response": None,
+        "error": None,
+        "compression": None,
+    }
+
+
 async def run_agent(session: Session, user_input: str) -> tuple[Session, AgentResponse | None, str | None]:
     """Run the planning agent for one turn.
 
@@ -311,13 +511,24 @@ async def run_agent(session: Session, user_input: str) -> tuple[Session, AgentRe
     """
     graph = _get_graph()
 
-    initial_state: AgentState = {
-        "session": session,
-        "user_input": user_input,
-        "agent_response": None,
-        "error": None,
-    }
-
-    result = await graph.ainvoke(initial_state)
+    result = await graph.ainvoke(_initial_state(session, user_input))
 
     return result["session"], result.get("agent_response"), result.get("error")
+
+
+async def stream_agent(session: Session, user_input: str) -> AsyncIterator[tuple[str, Any]]:
+    """Run the planning agent for one turn, streaming the reply.
+
+    Yields ``("delta", text)`` as ``response_to_user`` is generated, then a
+    single ``("result", (updated_session, agent_response_or_None, error_or_None))``.
+    """
+    graph = _get_graph()
+
+    final_state: AgentState = _initial_state(session, user_input)
+    async for mode, chunk in graph.astream(final_state, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield "delta", chunk["delta"]
+        else:
+            final_state = chunk
+
+    yield "result", (final_state["session"], final_state.get("agent_response"), final_state.get("error"))
@@ -0,0 +1,140 @@
+"""Response cache for the planning agent – exact and semantic lookups.
+
+Both tiers are partitioned by a digest of the prompt *prefix* (system prompt,
+compressed context, plan context, preferences and prior history).  A cached
+response is therefore only ever reused for a conversation in exactly the same
+state; the tiers differ in how the latest user turn is matched:
+
+* ``ExactCache``    – normalised user text must match verbatim.
+* ``SemanticCache`` – user text must be within a cosine-similarity threshold
+  (requires the optional ``sentence-transformers`` package).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Optional, Sequence
+
+from cachetools import LRUCache
+from langchain_core.messages import BaseMessage
+
+from backend.models import AgentResponse
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAXSIZE = 10_000
+SEMANTIC_MODEL_NAME = "all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.90
+SEMANTIC_ENTRIES_PER_PREFIX = 32
+
+
+def normalize_input(text: str) -> str:
+    """Lower-case and collapse whitespace so trivial variations share a key."""
+    return " ".join(text.lower().split())
+
+
+def prompt_key(messages: Sequence[BaseMessage]) -> str:
+    """Return a stable digest of a prompt payload (message types + contents)."""
+    digest = hashlib.blake2b(digest_size=20)
+    for msg in messages:
+        digest.update(msg.type.encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(str(msg.content).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def exact_key(prefix_key: str, user_input: str) -> str:
+    return hashlib.blake2b(
+        f"{prefix_key}\x1d{normalize_input(user_input)}".encode("utf-8"),
+        digest_size=20,
+    ).hexdigest()
+
+
+class ExactCache:
+    """Bounded LRU of prompt digest → validated ``AgentResponse``."""
+
+    def __init__(self, maxsize: int = CACHE_MAXSIZE) -> None:
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[AgentResponse]:
+        cached = self._entries.get(key)
+        # Hand out copies — the graph mutates responses/plans downstream.
+        return cached.model_copy(deep=True) if cached is not None else None
+
+    def put(self, key: str, response: AgentResponse) -> None:
+        self._entries[key] = response.model_copy(deep=True)
+
+
+class SemanticCache:
+    """Nearest-neighbour lookup of user turns within the same partition.
+
+    Callers choose the partition key; it should include the user as well as
+    the prompt prefix, since a hit hands back the stored plan verbatim.
+
+    Embeddings are L2-normalised, so the inner product is the cosine
+    similarity.  The embedding model is loaded lazily on first use; if
+    ``sentence-transformers`` is not installed the cache silently disables
+    itself and every lookup is a miss.
+    """
+
+    def __init__(
+        self,
+        model_name: str = SEMANTIC_MODEL_NAME,
+        threshold: float = SEMANTIC_THRESHOLD,
+        maxsize: int = CACHE_MAXSIZE,
+    ) -> None:
+        self._model_name = model_name
+        self._threshold = threshold
+        self._partitions: LRUCache = LRUCache(maxsize=maxsize)
+        self._model: Any = None
+        self._available = True
+        self._load_lock = asyncio.Lock()
+
+    def _load_model(self) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer  # deferred import
+        except ImportError:
+            logger.info("sentence-transformers not installed — semantic response cache disabled")
+            self._available = False
+            return
+        self._model = SentenceTransformer(self._model_name)
+
+    async def embed(self, text: str) -> Any:
+        """Return a normalised embedding for *text*, or None if unavailable."""
+        if not self._available:
+            return None
+        if self._model is None:
+            async with self._load_lock:
+                if self._model is None and self._available:
+                    await asyncio.to_thread(self._load_model)
+            if self._model is None:
+                return None
+        return await asyncio.to_thread(
+            self._model.encode, normalize_input(text), normalize_embeddings=True
+        )
+
+    def get(self, prefix_key: str, vector: Any) -> Optional[AgentResponse]:
+        entries = self._partitions.get(prefix_key)
+        if vector is None or not entries:
+            return None
+        best_score, best_resp = max(
+            ((float(vec @ vector), resp) for vec, resp in entries),
+            key=lambda pair: pair[0],
+        )
+        if best_score < self._threshold:
+            return None
+        return best_resp.model_copy(deep=True)
+
+    def put(self, prefix_key: str, vector: Any, response: AgentResponse) -> None:
+        if vector is None:
+            return
+        entries = self._partitions.get(prefix_key)
+        if entries is None:
+            entries = []
+            self._partitions[prefix_key] = entries
+        entries.append((vector, response.model_copy(deep=True)))
+        if len(entries) > SEMANTIC_ENTRIES_PER_PREFIX:
+            del entries[0]
@@ -2,48 +2,80 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from pydantic import BaseModel, Field
 import bcrypt
 import jwt
+from cachetools import TLRUCache
 
 logger = logging.getLogger(__name__)
 
 # ── Password hashing ─────
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8")[:72], bcrypt.gensalt()).decode("utf-8")
+# bcrypt is deliberately slow (~100ms); run it in a worker thread so it
+# doesn't block the event loop for every register/login.
+async def hash_password(password: str) -> str:
+    hashed = await asyncio.to_thread(bcrypt.hashpw, password.encode("utf-8")[:72], bcrypt.gensalt())
+    return hashed.decode("utf-8")
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode("utf-8")[:72], hashed.encode("utf-8"))
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await asyncio.to_thread(bcrypt.checkpw, plain.encode("utf-8")[:72], hashed.encode("utf-8"))
 
 
 # ── JWT helpers ─────
 SECRET_KEY = os.getenv("JWT_SECRET", "plan-it-dev-secret-change-me")
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_HOURS = 72
+_TOKEN_TTL = timedelta(hours=TOKEN_EXPIRE_HOURS)
 
 
 def create_token(user_id: str, email: str) -> str:
     payload = {
         "sub": user_id,
         "email": email,
-        "exp": datetime.utcnow() + timedelta(hours=TOKEN_EXPIRE_HOURS),
+        "exp": datetime.now(timezone.utc) + _TOKEN_TTL,
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
+# Verified payloads by token digest, each kept until its token expires
+# (capped at 5 minutes).
+TOKEN_CACHE_MAX_TTL = 300
+
+
+def token_digest(token: str) -> bytes:
+    """Short, fixed-size cache key for a bearer token."""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+def _token_ttu(_key: bytes, payload: dict, now: float) -> float:
+    remaining = payload.get("exp", 0) - time.time()
+    return now + max(0.0, min(remaining, TOKEN_CACHE_MAX_TTL))
+
+
+_token_cache: TLRUCache = TLRUCache(maxsize=50_000, ttu=_token_ttu)
+
+
 def decode_token(token: str) -> dict | None:
     """Return payload dict or None if invalid / expired."""
+    key = token_digest(token)
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
         return None
+    _token_cache[key] = payload
+    return payload
 
 
 # ── User model ───────
@@ -52,7 +84,7 @@ class User(BaseModel):
     email: str
     hashed_password: str
     display_name: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 # ── User store abstraction ────
@@ -78,37 +110,44 @@ class UserStore:
     async def exists_email(self, email: str) -> bool:
         return email.lower() in self._emails
 
+    def invalidate(self, user_id: str) -> None:
+        """Drop any cached copy of a user. Call after updating the user."""
+
 
 class MongoUserStore(UserStore):
     """MongoDB-backed user store."""
 
+    # Strip Mongo's ObjectId server-side rather than popping it client-side.
+    _USER_PROJECTION = {"_id": 0}
+
     def __init__(self, db) -> None:
         self._collection = db["users"]
 
+    async def ensure_indexes(self) -> None:
+        """Create lookup indexes. Call once at startup."""
+        await self._collection.create_index("email", unique=True)
+        await self._collection.create_index("user_id", unique=True)
+
     async def get_by_id(self, user_id: str) -> Optional[User]:
-        doc = await self._collection.find_one({"user_id": user_id})
+        doc = await self._collection.find_one({"user_id": user_id}, self._USER_PROJECTION)
         if doc is None:
             return None
-        doc.pop("_id", None)
         return User.model_validate(doc)
 
     async def get_by_email(self, email: str) -> Optional[User]:
-        doc = await self._collection.find_one({"email": email.lower()})
+        doc = await self._collection.find_one({"email": email.lower()}, self._USER_PROJECTION)
         if doc is None:
             return None
-        doc.pop("_id", None)
         return User.model_validate(doc)
 
     async def create(self, user: User) -> None:
         data = user.model_dump(mode="json")
         data["email"] = data["email"].lower()
         await self._collection.insert_one(data)
-        # Ensure unique email index
-        await self._collection.create_index("email", unique=True)
 
     async def exists_email(self, email: str) -> bool:
-        count = await self._collection.count_documents({"email": email.lower()}, limit=1)
-        return count > 0
+        doc = await self._collection.find_one({"email": email.lower()}, {"_id": 1})
+        return doc is not None
 
 
 # ── Request / Response schemas ──────
@@ -2,14 +2,15 @@
 
 from __future__ import annotations
 
-import json
-from copy import deepcopy
+import re
+from functools import lru_cache
 from typing import Optional
 
+import orjson
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from backend.models import Message, MessageRole, Plan, Session
+from backend.models import Message, Plan, Session
 
 # Simulated token limit (8 000 tokens).  We approximate 1 token ≈ 4 chars.
 TOKEN_LIMIT = 8_000
@@ -19,6 +20,10 @@ CHAR_LIMIT = TOKEN_LIMIT * CHARS_PER_TOKEN  # close to 32 000 chars
 # When we hit 75 % of the limit we compress.
 COMPRESSION_THRESHOLD = int(CHAR_LIMIT * 0.75)
 
+# Below this size the running summary is extended with only the new messages;
+# above it, summary + new messages are consolidated into a fresh summary.
+SUMMARY_CONSOLIDATE_CHARS = COMPRESSION_THRESHOLD // 2
+
 
 def _estimate_tokens(text: str) -> int:
     """Rough token estimate."""
@@ -38,6 +43,22 @@ def _format_plan_for_context(plan: Optional[Plan]) -> str:
     return "\n".join(lines)
 
 
+@lru_cache(maxsize=128)
+def _format_plan_cached(plan_json: str) -> str:
+    """Memoised ``_format_plan_for_context`` keyed by the plan's JSON dump."""
+    return _format_plan_for_context(Plan.model_validate_json(plan_json))
+
+
+def _dump_preferences(preferences: dict) -> str:
+    return orjson.dumps(preferences, option=orjson.OPT_SORT_KEYS).decode()
+
+
+@lru_cache(maxsize=128)
+def _format_preferences_cached(items: frozenset) -> str:
+    """Memoised JSON rendering of user preferences (keys sorted for stability)."""
+    return _dump_preferences(dict(items))
+
+
 # ── Preference extraction ──────────────────────────────────────────
 
 _PREFERENCE_KEYWORDS = {
@@ -57,14 +78,20 @@ _PREFERENCE_KEYWORDS = {
 }
 
 
+# One compiled alternation per preference category — a single regex pass each.
+_PREF_PATTERNS = {
+    pref_key: re.compile(r"\b(" + "|".join(map(re.escape, keywords)) + r")\b", re.IGNORECASE)
+    for pref_key, keywords in _PREFERENCE_KEYWORDS.items()
+}
+
+
 def extract_preferences(text: str, existing: dict) -> dict:
     """Very lightweight keyword-based preference extraction."""
-    lower = text.lower()
     updated = dict(existing)
-    for pref_key, keywords in _PREFERENCE_KEYWORDS.items():
-        for word, value in keywords.items():
-            if word in lower:
-                updated[pref_key] = value
+    for pref_key, pattern in _PREF_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            updated[pref_key] = _PREFERENCE_KEYWORDS[pref_key][match.group(1).lower()]
     return updated
 
 
@@ -74,16 +101,50 @@ async def compress_history(
     current_plan: Optional[Plan],
     user_preferences: dict,
     llm: ChatGoogleGenerativeAI,
+    existing_summary: Optional[str] = None,
 ) -> str:
-    """Compress the conversation history into a concise summary using the LLM."""
+    """Compress the conversation history into a concise summary using the LLM.
+
+    If *existing_summary* is given, only *messages* are summarised and the
+    result is appended to it, so earlier content is not re-summarised on
+    every compression.  Once the summary grows past
+    ``SUMMARY_CONSOLIDATE_CHARS`` it is folded into a fresh summary instead.
+    """
 
     history_text = "\n".join(
         f"[{m.role.value}] {m.content}" for m in messages
     )
     plan_text = _format_plan_for_context(current_plan)
-    prefs_text = json.dumps(user_preferences) if user_preferences else "None detected."
+    prefs_text = _dump_preferences(user_preferences) if user_preferences else "None detected."
+
+    extend = bool(existing_summary) and len(existing_summary) <= SUMMARY_CONSOLIDATE_CHARS
+
+    if extend:
+        compression_prompt = f"""You are a context-compression assistant.
+Extend the existing summary below with the new messages that follow it.
+Do not re-summarize the existing summary — write ONLY a concise paragraph
+covering what the new messages add:
+1. New requirements, decisions, preferences, and constraints.
+2. Changes to the state of the plan (included below for reference).
+3. Any open questions or pending items.
+
+Keep the new paragraph under 300 words.
+
+--- EXISTING SUMMARY ---
+{existing_summary}
 
-    compression_prompt = f"""You are a context-compression assistant.
+--- NEW MESSAGES ---
+{history_text}
+
+--- CURRENT PLAN ---
+{plan_text}
+
+--- DETECTED USER PREFERENCES ---
+{prefs_text}
+"""
+    else:
+        prior_text = f"--- PRIOR SUMMARY ---\n{existing_summary}\n\n" if existing_summary else ""
+        compression_prompt = f"""You are a context-compression assistant.
 Summarize the following conversation into a concise paragraph that preserves:
 1. The user's original goal and all key requirements.
 2. Every decision, preference, and constraint mentioned.
@@ -92,7 +153,7 @@ Summarize the following conversation into a concise paragraph that preserves:
 
 Keep the summary under 600 words.
 
---- CONVERSATION ---
+{prior_text}--- CONVERSATION ---
 {history_text}
 
 --- CURRENT PLAN ---
@@ -106,6 +167,8 @@ Keep the summary under 600 words.
         SystemMessage(content="You summarize conversations accurately and concisely."),
         HumanMessage(content=compression_prompt),
     ])
+    if extend:
+        return f"{existing_summary}\n\n{response.content}"
     return response.content
 
 
@@ -125,10 +188,11 @@ def build_context_messages(session: Session) -> list[dict]:
         })
 
     # Append remaining messages (newest portion kept after compression).
-    for msg in session.messages:
-        if msg.is_blocked:
-            continue
-        context_parts.append({"role": msg.role.value, "content": msg.content})
+    context_parts.extend([
+        {"role": msg.role.value, "content": msg.content}
+        for msg in session.messages
+        if not msg.is_blocked
+    ])
 
     return context_parts
 
@@ -136,9 +200,10 @@ def build_context_messages(session: Session) -> list[dict]:
 async def maybe_compress(session: Session, llm: ChatGoogleGenerativeAI) -> Session:
     """Check if the session's history exceeds the threshold and compress if needed.
 
-    Returns a *new* Session object (does not mutate in-place).
+    Returns a *new* Session object (does not mutate in-place).  The copy is
+    shallow: plan, version and preference objects are shared with the input.
     """
-    total_chars = sum(len(m.content) for m in session.messages)
+    total_chars = session.messages_char_count
     if session.compressed_context:
         total_chars += len(session.compressed_context)
 
@@ -147,23 +212,21 @@ async def maybe_compress(session: Session, llm: ChatGoogleGenerativeAI) -> Sessi
 
     # Compress everything except the last 4 messages (keep recent context).
     keep_recent = 4
-    messages_to_compress = session.messages[:-keep_recent] if len(session.messages) > keep_recent else []
-    recent_messages = session.messages[-keep_recent:] if len(session.messages) > keep_recent else session.messages
-
-    if not messages_to_compress and not session.compressed_context:
-        return session  # Nothing useful to compress
-
-    # Combine old compressed context + messages to compress
-    all_to_compress = []
-    if session.compressed_context:
-        all_to_compress.append(
-            Message(role=MessageRole.SYSTEM, content=f"[Prior compressed context]: {session.compressed_context}")
-        )
-    all_to_compress.extend(messages_to_compress)
-
-    compressed = await compress_history(all_to_compress, session.current_plan, session.user_preferences, llm)
+    split = len(session.messages) - keep_recent
+    if split <= 0:
+        return session  # Nothing new to fold into the summary
+    messages_to_compress = session.messages[:split]
+
+    compressed = await compress_history(
+        messages_to_compress,
+        session.current_plan,
+        session.user_preferences,
+        llm,
+        existing_summary=session.compressed_context,
+    )
 
-    new_session = deepcopy(session)
-    new_session.compressed_context = compressed
-    new_session.messages = list(recent_messages)
+    new_session = session.model_copy(
+        update={"compressed_context": compressed, "messages": session.messages[split:]}
+    )
+    new_session.recount_messages()
     return new_session
@@ -2,11 +2,11 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 
@@ -40,6 +40,10 @@ class ActionType(str, Enum):
 # ── Structured agent response ───
 
 class AgentResponse(BaseModel):
+    # Responses are produced once per turn (or served from cache) and only read
+    # afterwards; derive changes with model_copy(update=...).
+    model_config = ConfigDict(frozen=True)
+
     thought: str = Field(..., description="Internal reasoning about the user's request and state.")
     response_to_user: str = Field(
         ...,
@@ -78,7 +82,7 @@ class MessageRole(str, Enum):
 class Message(BaseModel):
     role: MessageRole
     content: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_blocked: bool = False
 
 
@@ -88,7 +92,7 @@ class PlanVersion(BaseModel):
     version: int
     plan: Plan
     change_summary: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 # ── Session state ────
@@ -110,6 +114,57 @@ class Session(BaseModel):
     plan_summary: Optional[str] = None
     change_summary: Optional[str] = None
     turn_count: int = 0
+    next_plan_version: int = 1
+
+    # Running total of len(m.content) over messages — keeps budget checks O(1).
+    _messages_char_count: int = PrivateAttr(default=0)
+    # (message count, version count, compressed_context) as last loaded from or
+    # written to the store; lets stores write only what changed since.
+    _persisted: Optional[tuple[int, int, Optional[str]]] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context) -> None:
+        self.recount_messages()
+        # Sessions stored before the counter existed: continue after the last version.
+        if self.plan_versions and self.next_plan_version <= self.plan_versions[-1].version:
+            self.next_plan_version = self.plan_versions[-1].version + 1
+
+    def take_plan_version(self) -> int:
+        """Return the next plan version number and advance the counter."""
+        version = self.next_plan_version
+        self.next_plan_version += 1
+        return version
+
+    @property
+    def messages_char_count(self) -> int:
+        return self._messages_char_count
+
+    def add_message(self, message: Message) -> None:
+        """Append a message and update the running character count."""
+        self.messages.append(message)
+        self._messages_char_count += len(message.content)
+
+    def recount_messages(self) -> None:
+        """Recompute the character count after ``messages`` is replaced wholesale."""
+        self._messages_char_count = sum(len(m.content) for m in self.messages)
+
+    @property
+    def persisted(self) -> Optional[tuple[int, int, Optional[str]]]:
+        return self._persisted
+
+    def persistence_snapshot(self) -> tuple[int, int, Optional[str]]:
+        return (len(self.messages), len(self.plan_versions), self.compressed_context)
+
+    def mark_persisted(self, snapshot: Optional[tuple[int, int, Optional[str]]] = None) -> None:
+        """Record *snapshot* (default: the current state) as what the store holds.
+
+        Stores that write asynchronously should take the snapshot when they
+        serialise, since the session may keep changing while the write is in flight.
+        """
+        self._persisted = snapshot if snapshot is not None else self.persistence_snapshot()
+
+    def forget_persisted(self) -> None:
+        """Make the next save write the whole document."""
+        self._persisted = None
 
 
 # ── API request / response models ────
@@ -128,4 +183,8 @@ class ChatResponse(BaseModel):
     conversation_summary: Optional[str] = None
     turn_count: int
     plan_version: Optional[int] = None
+    new_plan_version: Optional[PlanVersion] = Field(
+        default=None,
+        description="The version appended this turn, if any — clients append it locally.",
+    )
     awaiting_confirmation: bool = False
@@ -2,26 +2,40 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-import uuid
+import multiprocessing
+import os
+import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from backend.models import (
     ActionType,
+    AgentResponse,
     ChatRequest,
     ChatResponse,
     Plan,
     Session,
 )
-from backend.agent import run_agent
-from backend.session_store import SessionStore, MongoSessionStore, create_session_store
+from backend.agent import run_agent, stream_agent
+from backend.session_store import (
+    CachedSessionStore,
+    MongoSessionStore,
+    SessionStore,
+    create_session_store,
+    new_session_id,
+)
 from backend.auth import (
     User,
     UserStore,
@@ -33,6 +47,7 @@ from backend.auth import (
     verify_password,
     create_token,
     decode_token,
+    token_digest,
 )
 
 # Load .env from project root
@@ -41,25 +56,45 @@ load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ── Session store
-store: SessionStore | None = None
-user_store: UserStore | None = None
 security = HTTPBearer()
 
 
+def _in_worker_pool() -> bool:
+    """Best-effort check for running as one of several server processes.
+
+    Catches WEB_CONCURRENCY > 1 and ``uvicorn --workers N`` (whose workers
+    are spawned children; ``--reload`` also trips this).  Forked workers,
+    e.g. gunicorn, are not detectable from inside — see README.
+    """
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        return True
+    return multiprocessing.parent_process() is not None
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup / shutdown lifecycle."""
-    global store, user_store
-    store = create_session_store()
+    store: SessionStore = create_session_store()
     if isinstance(store, MongoSessionStore):
+        await store.ensure_indexes()
         user_store = MongoUserStore(store._db)
+        await user_store.ensure_indexes()
+        # Off by default: the write-behind cache holds live sessions per
+        # process, so workers would overwrite each other's turns.
+        cache_size = int(os.getenv("SESSION_CACHE_SIZE", "0"))
+        if cache_size > 0 and _in_worker_pool():
+            logger.warning("SESSION_CACHE_SIZE ignored: the session cache requires a single server process.")
+        elif cache_size > 0:
+            store = CachedSessionStore(store, maxsize=cache_size)
     else:
         user_store = UserStore()
+    app.state.store = store
+    app.state.user_store = user_store
     logger.info("Session store ready: %s", type(store).__name__)
     yield
     #cleanup
-    if isinstance(store, MongoSessionStore):
+    await _drain_saves()
+    if isinstance(store, (MongoSessionStore, CachedSessionStore)):
         await store.close()
         logger.info("MongoDB connection closed.")
 
@@ -73,29 +108,91 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# History / versions payloads grow with the session; compress anything over
+# 1KB.  text/event-stream (/chat/stream) is excluded by Starlette, so SSE
+# deltas are still flushed as they are produced.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+# ── Stores (set up in lifespan, injected per request)
+def get_store(request: Request) -> SessionStore:
+    return request.app.state.store
+
+
+def get_user_store(request: Request) -> UserStore:
+    return request.app.state.user_store
+
+
+# Resolved users by token hash → (User, token exp), so hot paths skip
+# decode + store lookup.  Keyed by token, so rotated tokens never hit.  This
+# is the only user cache: a changed or deleted user is seen within its TTL,
+# or immediately once invalidate_user() is called.
+_auth_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def invalidate_user(user_id: str, user_store: UserStore) -> None:
+    """Revoke cached auth for a user (call on logout / password change / deletion)."""
+    for key, (cached_user, _exp) in list(_auth_cache.items()):
+        if cached_user.user_id == user_id:
+            _auth_cache.pop(key, None)
+    user_store.invalidate(user_id)
+
+
+class Caller(NamedTuple):
+    user_id: str
+    user: Optional[User]  # from the auth cache; None → resolve it (then remember it)
+    exp: float
+    cache_key: bytes
+
+
+def _remember_user(caller: Caller, user: User) -> None:
+    _auth_cache[caller.cache_key] = (user, caller.exp)
+
 
 # auth endpoints
-async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Validate JWT and return User object."""
+async def get_caller(creds: HTTPAuthorizationCredentials = Depends(security)) -> Caller:
+    """Identify the caller from the auth cache, or else by validating the JWT.
+
+    ``user`` is only set on a cache hit, so endpoints that can resolve the
+    user together with other data (e.g. /chat fetching the session and its
+    owner in one store call) skip the users lookup entirely when it's warm.
+    """
+    key = token_digest(creds.credentials)
+    cached = _auth_cache.get(key)
+    if cached is not None and cached[1] > time.time():
+        user, exp = cached
+        return Caller(user.user_id, user, exp, key)
+
     payload = decode_token(creds.credentials)
     if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token.")
-    user = await user_store.get_by_id(payload["sub"])
+    return Caller(payload["sub"], None, payload["exp"], key)
+
+
+async def get_current_user(
+    caller: Caller = Depends(get_caller),
+    user_store: UserStore = Depends(get_user_store),
+) -> User:
+    """Validate JWT and return User object."""
+    if caller.user is not None:
+        return caller.user
+    user = await user_store.get_by_id(caller.user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found.")
+    _remember_user(caller, user)
     return user
 
 
 
 
 @app.post("/auth/register", response_model=AuthResponse)
-async def register(req: RegisterRequest):
+async def register(req: RegisterRequest, user_store: UserStore = Depends(get_user_store)):
     """Register a new user."""
     if await user_store.exists_email(req.email):
         raise HTTPException(status_code=409, detail="Email already registered.")
     user = User(
         email=req.email.lower(),
-        hashed_password=hash_password(req.password),
+        hashed_password=await hash_password(req.password),
         display_name=req.display_name,
     )
     await user_store.create(user)
@@ -104,10 +201,10 @@ async def register(req: RegisterRequest):
 
 
 @app.post("/auth/login", response_model=AuthResponse)
-async def login(req: LoginRequest):
+async def login(req: LoginRequest, user_store: UserStore = Depends(get_user_store)):
     """Authenticate and return a JWT."""
     user = await user_store.get_by_email(req.email)
-    if user is None or not verify_password(req.password, user.hashed_password):
+    if user is None or not await verify_password(req.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password.")
     token = create_token(user.user_id, user.email)
     return AuthResponse(token=token, user_id=user.user_id, email=user.email, display_name=user.display_name)
@@ -122,36 +219,47 @@ async def get_me(user: User = Depends(get_current_user)):
 
 
 @app.post("/session", response_model=dict)
-async def create_session(user: User = Depends(get_current_user)):
+async def create_session(
+    user: User = Depends(get_current_user),
+    store: SessionStore = Depends(get_store),
+):
     """Create a new conversation session for the authenticated user."""
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
     session = Session(session_id=session_id, user_id=user.user_id)
     await store.save(session)
     return {"session_id": session_id}
 
 
 @app.get("/sessions", response_model=list)
-async def list_sessions(user: User = Depends(get_current_user)):
-    """List all sessions for the authenticated user."""
-    return await store.list_by_user(user.user_id)
-
-
-@app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, user: User = Depends(get_current_user)):
-    """Send a message and get the agent's response."""
-    session = await store.get(req.session_id)
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found. Create one first via POST /session.")
-    if session.user_id != user.user_id:
-        raise HTTPException(status_code=403, detail="Access denied.")
-
-    updated_session, agent_resp, error = await run_agent(session, req.message)
-
-    # Persist updated session
-    await store.save(updated_session)
-
+async def list_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    user: User = Depends(get_current_user),
+    store: SessionStore = Depends(get_store),
+):
+    """List the authenticated user's sessions, newest first."""
+    await _drain_saves()
+    return await store.list_by_user(user.user_id, limit=limit)
+
+
+def _build_chat_response(
+    updated_session: Session,
+    agent_resp: AgentResponse | None,
+    error: str | None,
+    versions_before: int,
+) -> ChatResponse:
+    """Shape the outcome of one agent turn into the /chat response.
+
+    Every field comes from already-validated models, so the response is built
+    with ``model_construct`` and only serialised (not re-validated) on the
+    way out.
+    """
+    new_version = (
+        updated_session.plan_versions[-1]
+        if len(updated_session.plan_versions) > versions_before
+        else None
+    )
     if error or agent_resp is None:
-        return ChatResponse(
+        return ChatResponse.model_construct(
             response="Sorry, something went wrong. Please try again.",
             plan=updated_session.current_plan,
             action=ActionType.NONE,
@@ -160,9 +268,10 @@ async def chat(req: ChatRequest, user: User = Depends(get_current_user)):
             conversation_summary=updated_session.conversation_summary,
             turn_count=updated_session.turn_count,
             plan_version=len(updated_session.plan_versions) if updated_session.plan_versions else None,
+            new_plan_version=new_version,
         )
 
-    return ChatResponse(
+    return ChatResponse.model_construct(
         response=agent_resp.response_to_user,
         plan=agent_resp.plan if agent_resp.action != ActionType.NONE else updated_session.current_plan,
         action=agent_resp.action,
@@ -171,54 +280,209 @@ async def chat(req: ChatRequest, user: User = Depends(get_current_user)):
         conversation_summary=agent_resp.conversation_summary,
         turn_count=updated_session.turn_count,
         plan_version=len(updated_session.plan_versions) if updated_session.plan_versions else None,
+        new_plan_version=new_version,
         awaiting_confirmation=updated_session.pending_plan is not None,
     )
 
 
-@app.get("/session/{session_id}", response_model=dict)
-async def get_session(session_id: str, user: User = Depends(get_current_user)):
-    """Retrieve session metadata (plan, turn count, versions)."""
-    session = await store.get(session_id)
+# ── Off-critical-path saves
+# Chat turns are written after the response is handed back.  Reads of a
+# session first wait for its in-flight save, so this process always sees its
+# own writes; saves for one session are chained so they land in order.
+_saves: dict[str, asyncio.Task] = {}
+
+
+def _save_in_background(store: SessionStore, session: Session) -> None:
+    session_id = session.session_id
+    previous = _saves.get(session_id)
+
+    async def run() -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await store.save(session)
+        except Exception:
+            logger.exception("Background save failed for session %s", session_id)
+
+    task = asyncio.create_task(run())
+    _saves[session_id] = task
+    task.add_done_callback(lambda t: _saves.pop(session_id, None) if _saves.get(session_id) is t else None)
+
+
+async def _wait_for_save(session_id: str) -> None:
+    task = _saves.get(session_id)
+    if task is not None:
+        await asyncio.wait([task])
+
+
+async def _drain_saves() -> None:
+    if _saves:
+        await asyncio.wait(list(_saves.values()))
+
+
+async def _get_chat_session(
+    session_id: str, caller: Caller, store: SessionStore, user_store: UserStore
+) -> Session:
+    """Fetch a session and check the caller owns it.
+
+    The owner comes from the auth cache when warm; otherwise it is fetched
+    together with the session in one store call and cached for next time.
+    """
+    await _wait_for_save(session_id)
+    if caller.user is not None:
+        session, owner = await store.get(session_id), caller.user
+    else:
+        session, owner = await store.get_with_owner(session_id, user_store)
     if session is None:
-        raise HTTPException(status_code=404, detail="Session not found.")
-    if session.user_id != user.user_id:
+        raise HTTPException(status_code=404, detail="Session not found. Create one first via POST /session.")
+    if session.user_id != caller.user_id:
         raise HTTPException(status_code=403, detail="Access denied.")
+    if owner is None:
+        raise HTTPException(status_code=401, detail="User not found.")
+    if caller.user is None:
+        _remember_user(caller, owner)
+    return session
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(
+    req: ChatRequest,
+    caller: Caller = Depends(get_caller),
+    store: SessionStore = Depends(get_store),
+    user_store: UserStore = Depends(get_user_store),
+):
+    """Send a message and get the agent's response."""
+    session = await _get_chat_session(req.session_id, caller, store, user_store)
+
+    versions_before = len(session.plan_versions)
+    updated_session, agent_resp, error = await run_agent(session, req.message)
+
+    # Persist updated session once the response is on its way
+    _save_in_background(store, updated_session)
+
+    return _build_chat_response(updated_session, agent_resp, error, versions_before)
+
+
+# Running /chat/stream turns — held so they aren't garbage-collected if the
+# client goes away before the turn finishes.
+_turn_tasks: set[asyncio.Task] = set()
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    req: ChatRequest,
+    caller: Caller = Depends(get_caller),
+    store: SessionStore = Depends(get_store),
+    user_store: UserStore = Depends(get_user_store),
+):
+    """Like /chat, but streams the reply as server-sent events.
+
+    Emits ``{"type": "delta", "text": ...}`` events while the reply is being
+    generated, then one ``{"type": "response", "data": <ChatResponse>}``.
+
+    The turn runs in its own task and the SSE body only reads from it, so a
+    client that disconnects mid-reply still gets its turn saved.
+    """
+    session = await _get_chat_session(req.session_id, caller, store, user_store)
+
+    versions_before = len(session.plan_versions)
+    events: asyncio.Queue[bytes | None] = asyncio.Queue()
+
+    async def run_turn() -> None:
+        try:
+            async for kind, payload in stream_agent(session, req.message):
+                if kind == "delta":
+                    event = {"type": "delta", "text": payload}
+                else:
+                    updated_session, agent_resp, error = payload
+                    _save_in_background(store, updated_session)
+                    response = _build_chat_response(updated_session, agent_resp, error, versions_before)
+                    event = {"type": "response", "data": response.model_dump(mode="json")}
+                events.put_nowait(b"data: " + orjson.dumps(event) + b"\n\n")
+        except Exception:
+            logger.exception("Streaming turn failed for session %s", req.session_id)
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(run_turn())
+    _turn_tasks.add(task)
+    task.add_done_callback(_turn_tasks.discard)
+
+    async def body():
+        while (chunk := await events.get()) is not None:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/event-stream")
+
+
+def owned_session_fields(*fields: str):
+    """Dependency factory: fetch *fields* of a session the caller owns.
+
+    Shared by the session read endpoints; the store projects just these
+    fields, so ``messages`` (the bulk of a session) is never loaded.
+    """
+    async def dependency(
+        session_id: str,
+        user: User = Depends(get_current_user),
+        store: SessionStore = Depends(get_store),
+    ) -> dict:
+        await _wait_for_save(session_id)
+        doc = await store.get_fields(session_id, fields)
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Session not found.")
+        if doc.get("user_id") != user.user_id:
+            raise HTTPException(status_code=403, detail="Access denied.")
+        return doc
+
+    return dependency
+
+
+@app.get("/session/{session_id}", response_model=dict)
+async def get_session(
+    session_id: str,
+    doc: dict = Depends(owned_session_fields(
+        "turn_count", "current_plan", "plan_versions", "user_preferences",
+        "conversation_summary", "compressed_context",
+    )),
+):
+    """Retrieve session metadata (plan, turn count, versions)."""
     return {
-        "session_id": session.session_id,
-        "turn_count": session.turn_count,
-        "current_plan": session.current_plan.model_dump() if session.current_plan else None,
-        "plan_versions": [v.model_dump() for v in session.plan_versions],
-        "user_preferences": session.user_preferences,
-        "conversation_summary": session.conversation_summary,
-        "has_compressed_context": session.compressed_context is not None,
+        "session_id": session_id,
+        "turn_count": doc.get("turn_count", 0),
+        "current_plan": doc.get("current_plan"),
+        "plan_versions": doc.get("plan_versions", []),
+        "user_preferences": doc.get("user_preferences", {}),
+        "conversation_summary": doc.get("conversation_summary"),
+        "has_compressed_context": doc.get("compressed_context") is not None,
     }
 
 
 @app.get("/session/{session_id}/history", response_model=list)
-async def get_history(session_id: str, user: User = Depends(get_current_user)):
+async def get_history(
+    session_id: str,
+    user: User = Depends(get_current_user),
+    store: SessionStore = Depends(get_store),
+):
     """Return the conversation history for a session."""
-    session = await store.get(session_id)
-    if session is None:
+    await _wait_for_save(session_id)
+    doc = await store.get_messages(session_id)
+    if doc is None:
         raise HTTPException(status_code=404, detail="Session not found.")
-    if session.user_id != user.user_id:
+    if doc.get("user_id") != user.user_id:
         raise HTTPException(status_code=403, detail="Access denied.")
-    return [{"role": m.role.value, "content": m.content, "timestamp": m.timestamp.isoformat()} for m in session.messages]
+    return [{"role": m["role"], "content": m["content"], "timestamp": m["timestamp"]} for m in doc.get("messages", [])]
 
 
 @app.get("/session/{session_id}/versions", response_model=list)
-async def get_plan_versions(session_id: str, user: User = Depends(get_current_user)):
+async def get_plan_versions(doc: dict = Depends(owned_session_fields("plan_versions"))):
     """Return all plan versions for a session."""
-    session = await store.get(session_id)
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found.")
-    if session.user_id != user.user_id:
-        raise HTTPException(status_code=403, detail="Access denied.")
-    return [v.model_dump() for v in session.plan_versions]
+    return doc.get("plan_versions", [])
 
 
 @app.get("/health")
-async def health():
+async def health(request: Request):
     """Health check — also reports which storage backend is active."""
+    store = getattr(request.app.state, "store", None)
     return {
         "status": "ok",
         "store": type(store).__name__ if store else "not initialised",
@@ -226,17 +490,17 @@ async def health():
 
 
 @app.get("/session/{session_id}/summary", response_model=dict)
-async def get_conversation_summary(session_id: str, user: User = Depends(get_current_user)):
+async def get_conversation_summary(
+    session_id: str,
+    doc: dict = Depends(owned_session_fields(
+        "turn_count", "conversation_summary", "current_plan", "plan_versions",
+    )),
+):
     """Return the latest executive conversation summary."""
-    session = await store.get(session_id)
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found.")
-    if session.user_id != user.user_id:
-        raise HTTPException(status_code=403, detail="Access denied.")
     return {
-        "session_id": session.session_id,
-        "turn_count": session.turn_count,
-        "conversation_summary": session.conversation_summary,
-        "has_plan": session.current_plan is not None,
-        "plan_version": len(session.plan_versions) if session.plan_versions else 0,
+        "session_id": session_id,
+        "turn_count": doc.get("turn_count", 0),
+        "conversation_summary": doc.get("conversation_summary"),
+        "has_plan": doc.get("current_plan") is not None,
+        "plan_version": len(doc.get("plan_versions") or []),
     }
@@ -6,16 +6,32 @@ Otherwise, falls back to an in-memory dictionary (stateless across restarts).
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Optional
 
+from backend.auth import User, UserStore
 from backend.models import Session
 
 logger = logging.getLogger(__name__)
 
 
+def new_session_id() -> str:
+    """Return a UUIDv7 string (RFC 9562): 48-bit ms timestamp + 74 random bits.
+
+    Time-ordered ids land on the right edge of the ``session_id`` index
+    instead of scattering inserts across it like uuid4.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
 
 class SessionStore(ABC):
     """Base class for session storage backends."""
@@ -24,10 +40,38 @@ class SessionStore(ABC):
     async def get(self, session_id: str) -> Optional[Session]:
         ...
 
+    @abstractmethod
+    async def get_messages(self, session_id: str) -> Optional[dict]:
+        """Return ``{"user_id": ..., "messages": [...]}`` without loading the full Session.
+
+        Messages are plain JSON-mode dicts (role, content, timestamp, is_blocked).
+        """
+        ...
+
     @abstractmethod
     async def save(self, session: Session) -> None:
         ...
 
+    async def get_fields(self, session_id: str, fields: tuple[str, ...]) -> Optional[dict]:
+        """Return ``user_id`` plus *fields* as JSON-mode values, or None if missing.
+
+        For read endpoints that never need ``messages``; stores can project
+        instead of loading the full Session.
+        """
+        session = await self.get(session_id)
+        if session is None:
+            return None
+        return session.model_dump(mode="json", include={"user_id", *fields})
+
+    async def get_with_owner(
+        self, session_id: str, user_store: UserStore
+    ) -> tuple[Optional[Session], Optional[User]]:
+        """Return the session and its owner's account (None if either is missing)."""
+        session = await self.get(session_id)
+        if session is None or session.user_id is None:
+            return session, None
+        return session, await user_store.get_by_id(session.user_id)
+
     @abstractmethod
     async def delete(self, session_id: str) -> None:
         ...
@@ -37,8 +81,8 @@ class SessionStore(ABC):
         ...
 
     @abstractmethod
-    async def list_by_user(self, user_id: str) -> list[dict]:
-        """Return lightweight session summaries for a user."""
+    async def list_by_user(self, user_id: str, limit: int = 50) -> list[dict]:
+        """Return lightweight session summaries for a user, newest first."""
         ...
 
 
@@ -51,6 +95,15 @@ class InMemorySessionStore(SessionStore):
     async def get(self, session_id: str) -> Optional[Session]:
         return self._store.get(session_id)
 
+    async def get_messages(self, session_id: str) -> Optional[dict]:
+        session = self._store.get(session_id)
+        if session is None:
+            return None
+        return {
+            "user_id": session.user_id,
+            "messages": [m.model_dump(mode="json") for m in session.messages],
+        }
+
     async def save(self, session: Session) -> None:
         self._store[session.session_id] = session
 
@@ -60,9 +113,12 @@ class InMemorySessionStore(SessionStore):
     async def exists(self, session_id: str) -> bool:
         return session_id in self._store
 
-    async def list_by_user(self, user_id: str) -> list[dict]:
+    async def list_by_user(self, user_id: str, limit: int = 50) -> list[dict]:
         results = []
-        for s in self._store.values():
+        # Dicts keep insertion (= creation) order; walk it newest first.
+        for s in reversed(self._store.values()):
+            if len(results) >= limit:
+                break
             if s.user_id == user_id:
                 results.append({
                     "session_id": s.session_id,
@@ -73,31 +129,153 @@ class InMemorySessionStore(SessionStore):
         return results
 
 
+def _parse_write_concern(spec: str) -> dict:
+    """Parse ``"w=1,j=false"`` into WriteConcern kwargs (empty → server default)."""
+    options: dict = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, value = part.partition("=")
+        key, value = key.strip(), value.strip()
+        if key == "w":
+            options["w"] = int(value) if value.isdigit() else value
+        elif key in ("j", "fsync"):
+            options[key] = value.lower() in ("1", "true", "yes")
+        elif key == "wtimeout":
+            options["wtimeout"] = int(value)
+        else:
+            raise ValueError(f"Unknown SESSION_WRITE_CONCERN option: {key!r}")
+    return options
+
+
 class MongoSessionStore(SessionStore):
     """Async MongoDB-backed store using Motor."""
 
     def __init__(self, uri: str, db_name: str = "plan_it", collection_name: str = "sessions") -> None:
         from motor.motor_asyncio import AsyncIOMotorClient  # deferred import
-
-        self._client = AsyncIOMotorClient(uri)
+        from pymongo import WriteConcern
+
+        # Pool sized for concurrent /chat traffic rather than driver defaults.
+        self._client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=int(os.getenv("MONGO_POOL_MAX", "100")),
+            minPoolSize=int(os.getenv("MONGO_POOL_MIN", "10")),
+            maxIdleTimeMS=60_000,
+            serverSelectionTimeoutMS=5_000,
+            # zstd / snappy need the zstandard / python-snappy packages.
+            compressors=os.getenv("MONGO_COMPRESSORS", "zlib"),
+            appname="plan-it",
+        )
         self._db = self._client[db_name]
-        self._collection = self._db[collection_name]
+        # Chat turns are written unjournaled by default — a lost turn is cheap
+        # to redo.  Saves that add plan versions go through a journaled handle.
+        write_concern = _parse_write_concern(os.getenv("SESSION_WRITE_CONCERN", "w=1,j=false"))
+        self._collection = self._db.get_collection(
+            collection_name, write_concern=WriteConcern(**write_concern)
+        )
+        # j=True needs an acknowledged write, so w=0 is raised to w=1 here.
+        durable = {**write_concern, "j": True}
+        if durable.get("w") == 0:
+            durable["w"] = 1
+        self._durable_collection = self._db.get_collection(
+            collection_name, write_concern=WriteConcern(**durable)
+        )
         logger.info("MongoDB session store connected → %s.%s", db_name, collection_name)
 
+    async def ensure_indexes(self) -> None:
+        """Create lookup indexes. Call once at startup."""
+        await self._collection.create_index("session_id", unique=True)
+        # Serves list_by_user's filter + sort without a collection scan.
+        await self._collection.create_index([("user_id", 1), ("_id", -1)])
+
     async def get(self, session_id: str) -> Optional[Session]:
         doc = await self._collection.find_one({"session_id": session_id})
         if doc is None:
             return None
         doc.pop("_id", None)  # remove Mongo internal field
-        return Session.model_validate(doc)
+        session = Session.model_validate(doc)
+        session.mark_persisted()
+        return session
+
+    async def get_with_owner(
+        self, session_id: str, user_store: UserStore
+    ) -> tuple[Optional[Session], Optional[User]]:
+        # One round-trip: join the owner from the users collection server-side.
+        cursor = self._collection.aggregate([
+            {"$match": {"session_id": session_id}},
+            {"$limit": 1},
+            {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "user_id", "as": "_owner"}},
+            {"$project": {"_id": 0}},
+        ])
+        docs = await cursor.to_list(length=1)
+        if not docs:
+            return None, None
+        doc = docs[0]
+        owners = doc.pop("_owner", [])
+        session = Session.model_validate(doc)
+        session.mark_persisted()
+        if not owners:
+            return session, None
+        owner = owners[0]
+        owner.pop("_id", None)
+        return session, User.model_validate(owner)
+
+    async def get_messages(self, session_id: str) -> Optional[dict]:
+        # Projected read — skips plans/versions and Session validation entirely.
+        return await self._collection.find_one(
+            {"session_id": session_id},
+            {"messages": 1, "user_id": 1, "_id": 0},
+        )
+
+    async def get_fields(self, session_id: str, fields: tuple[str, ...]) -> Optional[dict]:
+        return await self._collection.find_one(
+            {"session_id": session_id},
+            {**dict.fromkeys(fields, 1), "user_id": 1, "_id": 0},
+        )
 
     async def save(self, session: Session) -> None:
-        data = session.model_dump(mode="json")
-        await self._collection.replace_one(
-            {"session_id": session.session_id},
-            data,
-            upsert=True,
+        """Write the session, sending only new messages / versions when possible.
+
+        Messages and plan versions are append-only between compressions, so a
+        session loaded from (or last saved to) this store is written with
+        ``$set`` for scalar fields and ``$push`` for the appended tail.  New
+        sessions, and sessions whose history was compressed since, are
+        written in full.
+        """
+        snapshot = session.persisted
+        collection = (
+            self._durable_collection
+            if len(session.plan_versions) > (snapshot[1] if snapshot else 0)
+            else self._collection
         )
+        if (
+            snapshot is None
+            or snapshot[2] != session.compressed_context
+            or len(session.messages) < snapshot[0]
+            or len(session.plan_versions) < snapshot[1]
+        ):
+            written = session.persistence_snapshot()
+            await collection.replace_one(
+                {"session_id": session.session_id},
+                session.model_dump(mode="json"),
+                upsert=True,
+            )
+            session.mark_persisted(written)
+            return
+
+        n_messages, n_versions, _ = snapshot
+        written = session.persistence_snapshot()
+        update: dict = {"$set": session.model_dump(mode="json", exclude={"messages", "plan_versions"})}
+        push = {}
+        if len(session.messages) > n_messages:
+            push["messages"] = {"$each": [m.model_dump(mode="json") for m in session.messages[n_messages:]]}
+        if len(session.plan_versions) > n_versions:
+            push["plan_versions"] = {
+                "$each": [v.model_dump(mode="json") for v in session.plan_versions[n_versions:]]
+            }
+        if push:
+            update["$push"] = push
+
+        await collection.update_one({"session_id": session.session_id}, update, upsert=True)
+        session.mark_persisted(written)
 
     async def delete(self, session_id: str) -> None:
         await self._collection.delete_one({"session_id": session_id})
@@ -106,25 +284,184 @@ class MongoSessionStore(SessionStore):
         count = await self._collection.count_documents({"session_id": session_id}, limit=1)
         return count > 0
 
-    async def list_by_user(self, user_id: str) -> list[dict]:
+    async def list_by_user(self, user_id: str, limit: int = 50) -> list[dict]:
+        # Newest first by ObjectId (creation time), sorted + limited server-side
+        # (served by the user_id/_id index) and fetched in one batch.
         cursor = self._collection.find(
             {"user_id": user_id},
             {"session_id": 1, "plan_name": 1, "turn_count": 1, "current_plan.title": 1, "_id": 0},
-        )
-        results = []
-        async for doc in cursor:
-            results.append({
+        ).sort("_id", -1).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        return [
+            {
                 "session_id": doc["session_id"],
                 "plan_name": doc.get("plan_name") or (doc.get("current_plan", {}) or {}).get("title"),
                 "turn_count": doc.get("turn_count", 0),
                 "has_plan": doc.get("current_plan") is not None,
-            })
-        return results
+            }
+            for doc in docs
+        ]
 
     async def close(self) -> None:
         self._client.close()
 
 
+class CachedSessionStore(SessionStore):
+    """Write-behind LRU cache in front of another (persistent) store.
+
+    Hot sessions are kept as ``Session`` objects, so a chat turn skips the
+    fetch + validate on read.  Readers get deep copies: a turn mutates its
+    session in place, and a failed or concurrent turn must not leak into the
+    cached copy.  ``save`` only marks a session dirty and schedules a flush
+    ``FLUSH_DELAY`` seconds later; saves landing in that window are
+    coalesced into one write.  Writes for a session are serialised by a
+    per-session lock.
+
+    The cache is per process — only use it with a single worker.
+    """
+
+    FLUSH_DELAY = 0.5
+    RETRY_DELAY = 5.0
+
+    def __init__(self, inner: SessionStore, maxsize: int = 1024) -> None:
+        self.inner = inner
+        self._maxsize = maxsize
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._pending: dict[str, Session] = {}       # dirty, awaiting flush
+        # What the inner store last held per session (Session.persisted).
+        self._written: dict[str, Optional[tuple]] = {}
+        self._flush_tasks: dict[str, asyncio.Task] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._closing = False
+
+    def _remember(self, session: Session) -> None:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self._maxsize:
+            # Evicted sessions that are still dirty stay in _pending until flushed.
+            evicted, _ = self._sessions.popitem(last=False)
+            if evicted not in self._pending:
+                self._written.pop(evicted, None)
+
+    def _cached(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id) or self._pending.get(session_id)
+        if session is not None:
+            self._remember(session)
+        return session
+
+    def _loaded(self, session: Session) -> Session:
+        self._written[session.session_id] = session.persisted
+        self._remember(session)
+        return session.model_copy(deep=True)
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = self._cached(session_id)
+        if session is not None:
+            return session.model_copy(deep=True)
+        session = await self.inner.get(session_id)
+        return self._loaded(session) if session is not None else None
+
+    async def get_with_owner(
+        self, session_id: str, user_store: UserStore
+    ) -> tuple[Optional[Session], Optional[User]]:
+        session = self._cached(session_id)
+        if session is None:
+            session, owner = await self.inner.get_with_owner(session_id, user_store)
+            return (self._loaded(session) if session is not None else None), owner
+        session = session.model_copy(deep=True)
+        if session.user_id is None:
+            return session, None
+        return session, await user_store.get_by_id(session.user_id)
+
+    async def get_messages(self, session_id: str) -> Optional[dict]:
+        session = self._cached(session_id)
+        if session is None:
+            return await self.inner.get_messages(session_id)
+        return {
+            "user_id": session.user_id,
+            "messages": [m.model_dump(mode="json") for m in session.messages],
+        }
+
+    async def get_fields(self, session_id: str, fields: tuple[str, ...]) -> Optional[dict]:
+        session = self._cached(session_id)
+        if session is None:
+            return await self.inner.get_fields(session_id, fields)
+        return session.model_dump(mode="json", include={"user_id", *fields})
+
+    async def save(self, session: Session) -> None:
+        session_id = session.session_id
+        self._remember(session)
+        self._pending[session_id] = session
+        self._schedule_flush(session_id, self.FLUSH_DELAY)
+
+    def _schedule_flush(self, session_id: str, delay: float) -> None:
+        if session_id not in self._flush_tasks:
+            self._flush_tasks[session_id] = asyncio.create_task(self._flush_later(session_id, delay))
+
+    async def _flush_later(self, session_id: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._flush_tasks.pop(session_id, None)
+        await self._flush(session_id)
+
+    async def _flush(self, session_id: str) -> None:
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = self._pending.pop(session_id, None)
+            if session is not None:
+                # A copy handed out before an earlier flush carries a stale
+                # snapshot; an incremental write would re-push messages.
+                if session.persisted != self._written.get(session_id):
+                    session.forget_persisted()
+                try:
+                    await self.inner.save(session)
+                    self._written[session_id] = session.persisted
+                except Exception:
+                    self._pending.setdefault(session_id, session)
+                    if self._closing:
+                        logger.exception("Failed to flush session %s on shutdown — changes lost", session_id)
+                    else:
+                        logger.exception("Failed to flush session %s — retrying in %.0fs", session_id, self.RETRY_DELAY)
+                        self._schedule_flush(session_id, self.RETRY_DELAY)
+        if not lock.locked() and session_id not in self._pending:
+            self._locks.pop(session_id, None)
+
+    async def flush_all(self) -> None:
+        """Write every dirty session now (e.g. on shutdown)."""
+        for task in self._flush_tasks.values():
+            task.cancel()
+        self._flush_tasks.clear()
+        for session_id in list(self._pending):
+            await self._flush(session_id)
+        # Wait out flushes that were already mid-write.
+        for lock in list(self._locks.values()):
+            async with lock:
+                pass
+
+    async def delete(self, session_id: str) -> None:
+        task = self._flush_tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        self._pending.pop(session_id, None)
+        self._sessions.pop(session_id, None)
+        self._written.pop(session_id, None)
+        await self.inner.delete(session_id)
+
+    async def exists(self, session_id: str) -> bool:
+        return self._cached(session_id) is not None or await self.inner.exists(session_id)
+
+    async def list_by_user(self, user_id: str, limit: int = 50) -> list[dict]:
+        # The listing comes from the inner store — flush this user's dirty sessions first.
+        for session_id, session in list(self._pending.items()):
+            if session.user_id == user_id:
+                await self._flush(session_id)
+        return await self.inner.list_by_user(user_id, limit=limit)
+
+    async def close(self) -> None:
+        self._closing = True
+        await self.flush_all()
+        if isinstance(self.inner, MongoSessionStore):
+            await self.inner.close()
+
 
 def create_session_store() -> SessionStore:
     """Create the appropriate store based on environment config.
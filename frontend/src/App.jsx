@@ -4,7 +4,7 @@ import PlanPanel from './PlanPanel';
 import AuthScreen from './AuthScreen';
 import SessionSidebar from './SessionSidebar';
 import {
-  createSession, sendMessage, getPlanVersions, getSession, getHistory,
+  createSession, streamMessage, getSession, getHistory,
   login, register, setToken, getToken, clearAuth, listSessions,
 } from './api';
 
@@ -48,7 +48,7 @@ export default function App() {
 
   // ── Session management ──────────────────────────────────────────
 
-  const resetSession = () => {
+  const resetSession = useCallback(() => {
     setSessionId(null);
     setMessages([]);
     setCurrentPlan(null);
@@ -60,9 +60,9 @@ export default function App() {
     setPlanVersions([]);
     setTurnCount(0);
     setUpdatedStepIds(new Set());
-  };
+  }, []);
 
-  const initSession = async () => {
+  const initSession = useCallback(async () => {
     try {
       const data = await createSession();
       resetSession();
@@ -70,7 +70,7 @@ export default function App() {
     } catch (err) {
       console.error('Failed to create session:', err);
     }
-  };
+  }, [resetSession]);
 
   const loadSession = async (sid) => {
     try {
@@ -94,7 +94,7 @@ export default function App() {
   // Create first session when user logs in if no session active
   useEffect(() => {
     if (isLoggedIn && !sessionId) {
-      // Check if user has existing sessions
+      // Resume the most recently created session, if any (the list is newest first)
       listSessions().then(sessions => {
         if (sessions.length > 0) {
           loadSession(sessions[0].session_id);
@@ -114,10 +114,19 @@ export default function App() {
       setMessages((prev) => [...prev, { role: 'user', content: text }]);
       setIsLoading(true);
 
-      try {
-        const data = await sendMessage(sessionId, text);
+      // Drop the in-progress streamed bubble (if any) before adding the final reply.
+      const withoutStreaming = (prev) => (prev[prev.length - 1]?.streaming ? prev.slice(0, -1) : prev);
 
-        setMessages((prev) => [...prev, { role: 'assistant', content: data.response }]);
+      try {
+        const data = await streamMessage(sessionId, text, (delta) => {
+          setMessages((prev) => {
+            const last = prev[prev.length - 1];
+            if (last?.streaming) return [...prev.slice(0, -1), { ...last, content: last.content + delta }];
+            return [...prev, { role: 'assistant', content: delta, streaming: true }];
+          });
+        });
+
+        setMessages((prev) => [...withoutStreaming(prev), { role: 'assistant', content: data.response }]);
         setTurnCount(data.turn_count || 0);
 
         if (data.plan) {
@@ -161,15 +170,12 @@ export default function App() {
         if (data.conversation_summary) setConversationSummary(data.conversation_summary);
         if (data.change_summary) setChangeSummary(data.change_summary);
 
-        if (data.plan_version) {
-          try {
-            const versions = await getPlanVersions(sessionId);
-            setPlanVersions(versions);
-          } catch {}
+        if (data.new_plan_version) {
+          setPlanVersions((prev) => [...prev, data.new_plan_version]);
         }
       } catch (err) {
         setMessages((prev) => [
-          ...prev,
+          ...withoutStreaming(prev),
           { role: 'assistant', content: 'Sorry, something went wrong. Please try again.' },
         ]);
         console.error(err);
@@ -180,8 +186,9 @@ export default function App() {
     [sessionId, isLoading]
   );
 
-  const handleApprove = () => handleSend('Yes, go ahead and finalize this plan.');
-  const handleReject = () => handleSend("I'd like to make some changes to this plan.");
+  // Stable callbacks so the memoised PlanPanel skips re-renders while streaming.
+  const handleApprove = useCallback(() => handleSend('Yes, go ahead and finalize this plan.'), [handleSend]);
+  const handleReject = useCallback(() => handleSend("I'd like to make some changes to this plan."), [handleSend]);
 
   // ── Not logged in ───────────────────────────────────────────────
 
@@ -1,7 +1,21 @@
-import { useRef, useEffect } from 'react';
+import { memo, useRef, useEffect } from 'react';
 import { Send, Bot, User, Loader2 } from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
 
+// Memoised so only the bubble being streamed re-renders its markdown.
+const ChatBubble = memo(function ChatBubble({ role, content }) {
+  return (
+    <div className={`chat-bubble ${role}`}>
+      <div className="bubble-avatar">
+        {role === 'user' ? <User size={16} /> : <Bot size={16} />}
+      </div>
+      <div className="bubble-content">
+        <ReactMarkdown>{content}</ReactMarkdown>
+      </div>
+    </div>
+  );
+});
+
 export default function ChatPanel({ messages, onSend, isLoading, onAutoMessage }) {
   const endRef = useRef(null);
   const inputRef = useRef(null);
@@ -47,17 +61,10 @@ export default function ChatPanel({ messages, onSend, isLoading, onAutoMessage }
         )}
 
         {messages.map((msg, i) => (
-          <div key={i} className={`chat-bubble ${msg.role}`}>
-            <div className="bubble-avatar">
-              {msg.role === 'user' ? <User size={16} /> : <Bot size={16} />}
-            </div>
-            <div className="bubble-content">
-              <ReactMarkdown>{msg.content}</ReactMarkdown>
-            </div>
-          </div>
+          <ChatBubble key={i} role={msg.role} content={msg.content} />
         ))}
 
-        {isLoading && (
+        {isLoading && !messages[messages.length - 1]?.streaming && (
           <div className="chat-bubble assistant">
             <div className="bubble-avatar">
               <Bot size={16} />
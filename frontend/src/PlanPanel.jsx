@@ -1,4 +1,4 @@
-import { useState, useRef } from 'react';
+import { memo, useState, useRef } from 'react';
 import {
   CheckCircle2,
   Circle,
@@ -155,7 +155,9 @@ function Versions({ versions }) {
 }
 
 /* ── Main panel ───────────────────────────────────────────────────── */
-export default function PlanPanel({
+// Memoised: streamed chat deltas re-render App on every token, but the plan
+// only changes once per turn.
+export default memo(function PlanPanel({
   currentPlan, pendingPlan, awaitingConfirmation,
   planSummary, changeSummary, conversationSummary,
   planVersions, turnCount, sessionId, updatedStepIds,
@@ -242,4 +244,4 @@ export default function PlanPanel({
       </div>
     </div>
   );
-}
+});
@@ -84,6 +84,37 @@ export async function sendMessage(sessionId, message) {
   return res.json();
 }
 
+// Streams the reply as server-sent events: calls onDelta(text) for each chunk
+// of the assistant's reply and resolves with the final chat response.
+export async function streamMessage(sessionId, message, onDelta) {
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: 'POST',
+    headers: authHeaders(),
+    body: JSON.stringify({ session_id: sessionId, message }),
+  });
+  if (!res.ok || !res.body) throw new Error('Failed to send message');
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const raw of events) {
+      if (!raw.startsWith('data: ')) continue;
+      const event = JSON.parse(raw.slice(6));
+      if (event.type === 'delta') onDelta?.(event.text);
+      else if (event.type === 'response') result = event.data;
+    }
+  }
+  if (!result) throw new Error('Stream ended without a response');
+  return result;
+}
+
 export async function getSession(sessionId) {
   const res = await fetch(`${API_BASE}/session/${sessionId}`, { headers: authHeaders() });
   if (!res.ok) throw new Error('Failed to get session');
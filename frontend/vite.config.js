@@ -1,3 +1,4 @@
+import http from 'node:http'
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
 
@@ -10,6 +11,8 @@ export default defineConfig({
         target: 'http://localhost:8000',
         changeOrigin: true,
         rewrite: (path) => path.replace(/^\/api/, ''),
+        // Reuse backend connections instead of opening one per proxied request.
+        agent: new http.Agent({ keepAlive: true }),
       },
     },
   },